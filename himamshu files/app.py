@@ -1,10 +1,199 @@
-import torch
-from transformers import AutoTokenizer, AutoModelForCausalLM, pipeline
-from typing import List, Dict
+import os
+import sys
+import copy
+import asyncio
+import importlib.util
+from collections import deque, OrderedDict
+from functools import lru_cache
+from types import MappingProxyType
+from typing import List, Dict, NamedTuple, Optional, Tuple, TYPE_CHECKING
+from pathlib import Path
 import re
-import gradio as gr
+
+# torch, transformers and gradio are imported where they are used, so importing
+# this module stays fast and an idle worker does not hold them in memory
+if TYPE_CHECKING:
+    import torch
+
+# Static prompt scaffold, split so the invariant parts can be tokenized once
+PROMPT_PREFIX = "You are a friendly tutor for Indian 11th and 12th standard students. Answer the question clearly and simply.\n\n"
+PROMPT_QUESTION = """
+Question: {question}
+
+Please provide:
+- Clear explanation in simple English
+- Step-by-step reasoning if needed
+- Examples from daily life when possible
+- Key points to remember
+
+Answer:"""
+PROMPT_TEMPLATE = PROMPT_PREFIX + "{curriculum_info}" + PROMPT_QUESTION
+
+def _freeze_curriculum(curriculum: Dict) -> MappingProxyType:
+    """Read-only view of the curriculum with topics stored as tuples of interned strings"""
+    return MappingProxyType({
+        subject: MappingProxyType({
+            grade: tuple(sys.intern(topic) for topic in topics)
+            for grade, topics in grades.items()
+        })
+        for subject, grades in curriculum.items()
+    })
+
+# Read-only tables built once at import and shared by every chatbot instance
+_CURRICULUM = _freeze_curriculum({
+    "physics": {
+        "11th": ["Physical World", "Units and Measurements", "Motion in Straight Line", 
+                "Laws of Motion", "Work, Energy and Power", "System of Particles", 
+                "Gravitation", "Mechanical Properties", "Thermodynamics", "Kinetic Theory", 
+                "Oscillations", "Waves"],
+        "12th": ["Electric Charges and Fields", "Electrostatic Potential", "Current Electricity", 
+                "Moving Charges and Magnetism", "Magnetism", "Electromagnetic Induction", 
+                "Alternating Current", "Electromagnetic Waves", "Ray Optics", "Wave Optics", 
+                "Dual Nature", "Atoms", "Nuclei", "Semiconductors"]
+    },
+    "chemistry": {
+        "11th": ["Basic Concepts", "Structure of Atom", "Classification", "Chemical Bonding", 
+                "States of Matter", "Thermodynamics", "Equilibrium", "Redox Reactions", 
+                "Hydrogen", "s-Block", "p-Block", "Organic Chemistry", "Hydrocarbons", 
+                "Environmental Chemistry"],
+        "12th": ["Solid State", "Solutions", "Electrochemistry", "Chemical Kinetics", 
+                "Surface Chemistry", "p-Block", "d and f Block", "Coordination Compounds", 
+                "Haloalkanes", "Alcohols", "Ethers", "Aldehydes", "Ketones", "Carboxylic Acids", 
+                "Amines", "Biomolecules", "Polymers", "Chemistry in Everyday Life"]
+    },
+    "mathematics": {
+        "11th": ["Sets", "Relations and Functions", "Trigonometric Functions", 
+                "Complex Numbers", "Linear Inequalities", "Permutations", "Combinations", 
+                "Binomial Theorem", "Sequence and Series", "Straight Lines", "Conic Sections", 
+                "Introduction to 3D", "Limits and Derivatives", "Mathematical Reasoning", 
+                "Statistics", "Probability"],
+        "12th": ["Relations and Functions", "Inverse Trigonometric Functions", "Matrices", 
+                "Determinants", "Continuity and Differentiability", "Application of Derivatives", 
+                "Integrals", "Application of Integrals", "Differential Equations", "Vector Algebra", 
+                "Three Dimensional Geometry", "Linear Programming", "Probability"]
+    },
+    "biology": {
+        "11th": ["The Living World", "Biological Classification", "Plant Kingdom", 
+                "Animal Kingdom", "Morphology of Flowering Plants", "Anatomy of Flowering Plants", 
+                "Structural Organisation in Animals", "Cell-The Unit of Life", "Biomolecules", 
+                "Cell Cycle and Cell Division", "Transport in Plants", "Mineral Nutrition", 
+                "Photosynthesis in Higher Plants", "Respiration in Plants", "Plant Growth and Development", 
+                "Digestion and Absorption", "Breathing and Exchange of Gases", "Body Fluids and Circulation", 
+                "Excretory Products and their Elimination", "Locomotion and Movement", 
+                "Neural Control and Coordination", "Chemical Coordination and Integration"],
+        "12th": ["Reproduction in Organisms", "Sexual Reproduction in Flowering Plants", 
+                "Human Reproduction", "Reproductive Health", "Principles of Inheritance and Variation", 
+                "Molecular Basis of Inheritance", "Evolution", "Human Health and Disease", 
+                "Strategies for Enhancement in Food Production", "Microbes in Human Welfare", 
+                "Biotechnology: Principles and Processes", "Biotechnology and its Applications", 
+                "Organisms and Populations", "Ecosystem", "Biodiversity and Conservation", 
+                "Environmental Issues"]
+    },
+    "computer science": {
+        "11th": ["Computer Systems and Organisation", "Computational Thinking and Programming", 
+                "Society, Law and Ethics", "Python Programming", "Data Handling", 
+                "Flow of Control", "Functions", "Strings", "Lists, Tuples and Dictionaries", 
+                "Computer Networks", "Database Concepts", "SQL"],
+        "12th": ["Python Revision", "Advanced Programming with Python", "File Handling", 
+                "Data Structures", "Computer Networks", "Database Management", "SQL Queries", 
+                "Interface Python with SQL", "Society, Law and Ethics"]
+    },
+    "english": {
+        "11th": ["Reading Comprehension", "Writing Skills", "Grammar", "Literature", 
+                "Poetry", "Prose", "Drama", "Communication Skills"],
+        "12th": ["Advanced Reading", "Professional Writing", "Advanced Grammar", 
+                "Flamingo (Prose)", "Flamingo (Poetry)", "Vistas", "Novel", "Report Writing"]
+    }
+})
+
+# Subject keywords, checked in this order. Questions are matched word by word, so
+# derived forms (magnetic, mathematical) are listed next to their keyword
+_SUBJECT_KEYWORDS = (
+    ('physics', ('physics', 'physical', 'force', 'energy', 'energies', 'motion', 'electricity', 'electric', 'electrical', 'optics', 'optic', 'optical', 'magnetism', 'magnet', 'magnetic', 'newton', 'newtonian', 'quantum', 'wave', 'atom', 'atomic')),
+    ('chemistry', ('chemistry', 'chemist', 'atom', 'molecule', 'molecular', 'reaction', 'organic', 'periodic', 'chemical', 'bond', 'bonding', 'compound', 'element')),
+    ('mathematics', ('math', 'mathematics', 'mathematical', 'calculus', 'algebra', 'algebraic', 'trigonometry', 'trigonometric', 'equation', 'derivative', 'integral', 'geometry', 'geometric', 'probability', 'probabilities', 'statistics', 'statistical')),
+    ('biology', ('biology', 'biological', 'cell', 'cellular', 'dna', 'evolution', 'evolutionary', 'respiration', 'photosynthesis', 'organism', 'reproduction', 'reproductive', 'genetics', 'genetic', 'plant', 'animal')),
+    ('computer science', ('programming', 'program', 'python', 'java', 'algorithm', 'algorithmic', 'database', 'computer', 'computing', 'code', 'coding', 'software', 'binary', 'variable')),
+    ('english', ('english', 'grammar', 'grammatical', 'literature', 'literary', 'writing', 'comprehension', 'poem', 'poetry', 'story', 'stories', 'essay', 'tense', 'vocabulary'))
+)
+
+# Keyword sets per subject, so detection is a set intersection with the question's words
+_SUBJECT_WORD_SETS = tuple((subject, frozenset(keywords)) for subject, keywords in _SUBJECT_KEYWORDS)
+
+_WORD = re.compile(r"[a-z]+")
+
+# Weight quantization methods accepted in EDUBOT_QUANTIZATION
+_QUANTIZATION_METHODS = ("torchao", "bnb", "bitsandbytes", "none")
+
+# Bit widths the HQQ quantized KV cache supports
+_HQQ_CACHE_BITS = (1, 2, 3, 4, 8)
+
+# Answers need at least this much room left in the KV cache
+_MIN_NEW_TOKENS = 64
+
+# Batched prompts are padded to one of these lengths so compiled graphs are reused
+_PROMPT_BUCKETS = (128, 256, 512)
+
+# Single requests pad the question part after the cached prefix to one of these lengths
+_QUESTION_BUCKETS = (32, 64, 128, 256, 512)
+
+# Definition-style questions get greedy decoding
+_FACTUAL_QUESTION = re.compile(r"^\s*(?:define|what\s+is|what\s+are|what's)\b", re.IGNORECASE)
+
+class ConversationTurn(NamedTuple):
+    """One question and answer in the conversation history"""
+    question: str
+    response: str
+    subject: str
+
+class ResponseCache:
+    """LRU cache of answers keyed by subject and normalized question
+    
+    Greedy answers are deterministic, so one is enough. Sampled answers are
+    collected until there are a few, then served in rotation.
+    """
+    
+    def __init__(self, maxsize: int = 256, samples: int = 3):
+        self.maxsize = maxsize
+        self.samples = samples
+        self.entries = OrderedDict()
+    
+    def key(self, subject: str, question: str) -> tuple:
+        return subject, " ".join(question.lower().split())
+    
+    def get(self, subject: str, question: str) -> Optional[str]:
+        """Cached answer, or None while the question still needs generating"""
+        key = self.key(subject, question)
+        answers = self.entries.get(key)
+        if answers is None or len(answers) < answers.maxlen:
+            return None
+        
+        self.entries.move_to_end(key)
+        answers.rotate(-1)
+        return answers[0]
+    
+    def put(self, subject: str, question: str, answer: str, sampled: bool):
+        key = self.key(subject, question)
+        answers = self.entries.get(key)
+        if answers is None or answers.maxlen != (self.samples if sampled else 1):
+            answers = deque(maxlen=self.samples if sampled else 1)
+            self.entries[key] = answers
+        answers.append(answer)
+        
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
 
 class EducationChatbot:
+    # Fixed attribute layout, no per-instance __dict__; every slot is assigned in __init__
+    __slots__ = (
+        "model_options", "model_name", "tokenizer", "model", "llm",
+        "eos_token_id", "stop_token_ids", "_greedy_options", "_sampled_options",
+        "cache_implementation", "max_cache_length", "kv_cache_bits",
+        "_prefix_ids", "_prefix_kv", "_static_caches", "conversation_history", "response_cache",
+        "curriculum_context", "_curriculum_info"
+    )
+    
     def __init__(self):
         # Using free, open-access models that don't require permission
         self.model_options = {
@@ -15,588 +204,708 @@ class EducationChatbot:
         self.model_name = self.model_options["tiny-llama"]  # Default model
         self.tokenizer = None
         self.model = None
-        self.conversation_history = []
+        self.llm = None
+        self.eos_token_id = None
+        self.stop_token_ids = []
+        self._greedy_options = {}
+        self._sampled_options = {}
+        self.cache_implementation = None
+        self.max_cache_length = 1024
+        self.kv_cache_bits = 4
+        self._prefix_ids = {}
+        self._prefix_kv = {}
+        self._static_caches = {}
+        # Bounded so a long-running server forgets the oldest turns
+        self.conversation_history = deque(maxlen=100)
+        self.response_cache = ResponseCache()
         self.curriculum_context = self.load_curriculum_context()
+        self._curriculum_info = self.create_curriculum_info_cache()
         self.setup_model()
         
     def setup_model(self):
         """Initialize the model and tokenizer"""
+        import torch
+        from transformers import AutoTokenizer, AutoModelForCausalLM
+        
+        if self.setup_vllm():
+            return
+        
         try:
             print(f"🔄 Loading model: {self.model_name}")
             
-            # Use pipeline for easier handling
-            self.pipe = pipeline(
-                "text-generation",
-                model=self.model_name,
-                torch_dtype=torch.float16,
+            self.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+            self.model = AutoModelForCausalLM.from_pretrained(
+                self.model_name,
+                torch_dtype=torch.bfloat16,
+                quantization_config=self.create_quantization_config(),
+                attn_implementation=self.select_attention_implementation(),
                 device_map="auto",
                 trust_remote_code=True
             )
+            
+            self.cache_implementation = self.select_cache_implementation()
+            self.model.generation_config.max_length = self.max_cache_length
+            self.prepare_generation()
+            self.compile_model()
             print("🤖 Education Chatbot initialized successfully!")
         except Exception as e:
             print(f"Error loading model: {e}")
             print("🔄 Trying fallback model...")
             self.setup_fallback_model()
     
+    def setup_vllm(self) -> bool:
+        """Serve the model with vLLM (paged KV cache, continuous batching) when EDUBOT_BACKEND=vllm"""
+        if os.environ.get("EDUBOT_BACKEND", "transformers").lower() != "vllm":
+            return False
+        
+        if importlib.util.find_spec("vllm") is None:
+            print("vLLM is not installed, using transformers")
+            return False
+        
+        try:
+            from vllm import LLM
+            
+            print(f"🔄 Loading model with vLLM: {self.model_name}")
+            # Every prompt starts with the same tutor and curriculum prefix, so let
+            # vLLM reuse its KV blocks across requests
+            self.llm = LLM(model=self.model_name, dtype="bfloat16", enable_prefix_caching=True)
+            self.tokenizer = self.llm.get_tokenizer()
+            self.eos_token_id = self.tokenizer.eos_token_id
+            self.stop_token_ids = self.create_stop_token_ids()
+            self.create_fixed_generation_options()
+            print("🤖 Education Chatbot initialized successfully with vLLM!")
+            return True
+        except Exception as e:
+            print(f"Error loading model with vLLM: {e}")
+            self.llm = None
+            return False
+    
     def setup_fallback_model(self):
         """Setup a simpler fallback model"""
+        from transformers import AutoTokenizer, AutoModelForCausalLM
+        
         try:
             self.model_name = "microsoft/DialoGPT-small"
-            self.pipe = pipeline("text-generation", model=self.model_name)
+            self.cache_implementation = None
+            self.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+            self.model = AutoModelForCausalLM.from_pretrained(self.model_name)
+            self.prepare_generation()
             print("🤖 Fallback model initialized successfully!")
         except Exception as e:
             print(f"Fallback model also failed: {e}")
-            self.pipe = None
-    
-    def load_curriculum_context(self) -> Dict:
-        """Load Indian curriculum context"""
-        return {
-            "physics": {
-                "11th": ["Physical World", "Units and Measurements", "Motion in Straight Line", 
-                        "Laws of Motion", "Work, Energy and Power", "System of Particles", 
-                        "Gravitation", "Mechanical Properties", "Thermodynamics", "Kinetic Theory", 
-                        "Oscillations", "Waves"],
-                "12th": ["Electric Charges and Fields", "Electrostatic Potential", "Current Electricity", 
-                        "Moving Charges and Magnetism", "Magnetism", "Electromagnetic Induction", 
-                        "Alternating Current", "Electromagnetic Waves", "Ray Optics", "Wave Optics", 
-                        "Dual Nature", "Atoms", "Nuclei", "Semiconductors"]
-            },
-            "chemistry": {
-                "11th": ["Basic Concepts", "Structure of Atom", "Classification", "Chemical Bonding", 
-                        "States of Matter", "Thermodynamics", "Equilibrium", "Redox Reactions", 
-                        "Hydrogen", "s-Block", "p-Block", "Organic Chemistry", "Hydrocarbons", 
-                        "Environmental Chemistry"],
-                "12th": ["Solid State", "Solutions", "Electrochemistry", "Chemical Kinetics", 
-                        "Surface Chemistry", "p-Block", "d and f Block", "Coordination Compounds", 
-                        "Haloalkanes", "Alcohols", "Ethers", "Aldehydes", "Ketones", "Carboxylic Acids", 
-                        "Amines", "Biomolecules", "Polymers", "Chemistry in Everyday Life"]
-            },
-            "mathematics": {
-                "11th": ["Sets", "Relations and Functions", "Trigonometric Functions", 
-                        "Complex Numbers", "Linear Inequalities", "Permutations", "Combinations", 
-                        "Binomial Theorem", "Sequence and Series", "Straight Lines", "Conic Sections", 
-                        "Introduction to 3D", "Limits and Derivatives", "Mathematical Reasoning", 
-                        "Statistics", "Probability"],
-                "12th": ["Relations and Functions", "Inverse Trigonometric Functions", "Matrices", 
-                        "Determinants", "Continuity and Differentiability", "Application of Derivatives", 
-                        "Integrals", "Application of Integrals", "Differential Equations", "Vector Algebra", 
-                        "Three Dimensional Geometry", "Linear Programming", "Probability"]
-            },
-            "biology": {
-                "11th": ["The Living World", "Biological Classification", "Plant Kingdom", 
-                        "Animal Kingdom", "Morphology of Flowering Plants", "Anatomy of Flowering Plants", 
-                        "Structural Organisation in Animals", "Cell-The Unit of Life", "Biomolecules", 
-                        "Cell Cycle and Cell Division", "Transport in Plants", "Mineral Nutrition", 
-                        "Photosynthesis in Higher Plants", "Respiration in Plants", "Plant Growth and Development", 
-                        "Digestion and Absorption", "Breathing and Exchange of Gases", "Body Fluids and Circulation", 
-                        "Excretory Products and their Elimination", "Locomotion and Movement", 
-                        "Neural Control and Coordination", "Chemical Coordination and Integration"],
-                "12th": ["Reproduction in Organisms", "Sexual Reproduction in Flowering Plants", 
-                        "Human Reproduction", "Reproductive Health", "Principles of Inheritance and Variation", 
-                        "Molecular Basis of Inheritance", "Evolution", "Human Health and Disease", 
-                        "Strategies for Enhancement in Food Production", "Microbes in Human Welfare", 
-                        "Biotechnology: Principles and Processes", "Biotechnology and its Applications", 
-                        "Organisms and Populations", "Ecosystem", "Biodiversity and Conservation", 
-                        "Environmental Issues"]
-            },
-            "computer science": {
-                "11th": ["Computer Systems and Organisation", "Computational Thinking and Programming", 
-                        "Society, Law and Ethics", "Python Programming", "Data Handling", 
-                        "Flow of Control", "Functions", "Strings", "Lists, Tuples and Dictionaries", 
-                        "Computer Networks", "Database Concepts", "SQL"],
-                "12th": ["Python Revision", "Advanced Programming with Python", "File Handling", 
-                        "Data Structures", "Computer Networks", "Database Management", "SQL Queries", 
-                        "Interface Python with SQL", "Society, Law and Ethics"]
-            },
-            "english": {
-                "11th": ["Reading Comprehension", "Writing Skills", "Grammar", "Literature", 
-                        "Poetry", "Prose", "Drama", "Communication Skills"],
-                "12th": ["Advanced Reading", "Professional Writing", "Advanced Grammar", 
-                        "Flamingo (Prose)", "Flamingo (Poetry)", "Vistas", "Novel", "Report Writing"]
-            }
-        }
+            self.model = None
     
-    def detect_subject(self, question: str) -> str:
-        """Detect the subject from the question"""
-        question_lower = question.lower()
-        
-        subject_keywords = {
-            'physics': ['physics', 'force', 'energy', 'motion', 'electricity', 'optics', 'magnetism', 'newton', 'quantum', 'wave', 'atom'],
-            'chemistry': ['chemistry', 'atom', 'molecule', 'reaction', 'organic', 'periodic', 'chemical', 'bond', 'compound', 'element'],
-            'mathematics': ['math', 'calculus', 'algebra', 'trigonometry', 'equation', 'derivative', 'integral', 'geometry', 'probability', 'statistics'],
-            'biology': ['biology', 'cell', 'dna', 'evolution', 'respiration', 'photosynthesis', 'organism', 'reproduction', 'genetics', 'plant', 'animal'],
-            'computer science': ['programming', 'python', 'java', 'algorithm', 'database', 'computer', 'code', 'software', 'binary', 'variable'],
-            'english': ['english', 'grammar', 'literature', 'writing', 'comprehension', 'poem', 'story', 'essay', 'tense', 'vocabulary']
-        }
+    def create_quantization_config(self):
+        """4-bit weight quantization config on GPU: torchao int4 by default, bitsandbytes NF4,
+        or none, chosen with EDUBOT_QUANTIZATION"""
+        import torch
+        from transformers import TorchAoConfig, BitsAndBytesConfig
         
-        for subject, keywords in subject_keywords.items():
-            if any(keyword in question_lower for keyword in keywords):
-                return subject
+        method = os.environ.get("EDUBOT_QUANTIZATION", "torchao").strip().lower()
+        if method not in _QUANTIZATION_METHODS:
+            print(f"EDUBOT_QUANTIZATION must be one of {_QUANTIZATION_METHODS}, got {method!r}; using torchao")
+            method = "torchao"
         
-        return "general"
+        if not torch.cuda.is_available() or method == "none":
+            return None
+        
+        if method in ("bnb", "bitsandbytes"):
+            if importlib.util.find_spec("bitsandbytes") is None:
+                print("Quantization unavailable, loading full weights: bitsandbytes is not installed")
+                return None
+            return BitsAndBytesConfig(
+                load_in_4bit=True,
+                bnb_4bit_quant_type="nf4",
+                bnb_4bit_compute_dtype=torch.bfloat16
+            )
+        
+        try:
+            return TorchAoConfig(quant_type="int4_weight_only", group_size=128)
+        except (ImportError, ValueError) as e:
+            print(f"Quantization unavailable, loading full weights: {e}")
+            return None
     
-    def create_enhanced_prompt(self, question: str, subject: str) -> str:
-        """Create enhanced prompt with curriculum context"""
+    def select_attention_implementation(self) -> str:
+        """Pick the fused attention kernel: FlashAttention-2 on Ampere or newer, SDPA otherwise"""
+        import torch
         
-        curriculum_info = ""
-        if subject in self.curriculum_context:
-            curriculum_info = f"""
-This is for Indian 11th/12th standard {subject} curriculum.
-Key topics include: {', '.join(self.curriculum_context[subject]['11th'][:3])} in 11th and {', '.join(self.curriculum_context[subject]['12th'][:3])} in 12th.
-
-"""
+        if (
+            torch.cuda.is_available()
+            and torch.cuda.get_device_capability()[0] >= 8
+            and importlib.util.find_spec("flash_attn") is not None
+        ):
+            return "flash_attention_2"
         
-        prompt = f"""You are a friendly tutor for Indian 11th and 12th standard students. Answer the question clearly and simply.
-
-{curriculum_info}
-Question: {question}
-
-Please provide:
-- Clear explanation in simple English
-- Step-by-step reasoning if needed
-- Examples from daily life when possible
-- Key points to remember
-
-Answer:"""
+        return "sdpa"
+    
+    def select_cache_implementation(self) -> str:
+        """Pick the KV cache: static by default, quantized when EDUBOT_KV_CACHE_BITS is set"""
+        kv_cache_bits = os.environ.get("EDUBOT_KV_CACHE_BITS", "").strip()
+        if kv_cache_bits:
+            if not kv_cache_bits.isdigit() or int(kv_cache_bits) not in _HQQ_CACHE_BITS:
+                print(f"EDUBOT_KV_CACHE_BITS must be one of {_HQQ_CACHE_BITS}, got {kv_cache_bits!r}; using a static cache")
+            elif importlib.util.find_spec("hqq") is None:
+                print("KV cache quantization needs the hqq package, using a static cache")
+            else:
+                self.kv_cache_bits = int(kv_cache_bits)
+                return "quantized"
         
-        return prompt
+        # A static KV cache keeps decode shapes fixed across requests
+        return "static"
     
-    def generate_response(self, question: str) -> str:
-        """Generate enhanced response with curriculum context"""
-        if not hasattr(self, 'pipe') or self.pipe is None:
-            return "I'm still getting ready to help you. Please wait a moment and try again."
+    def compile_model(self):
+        """Compile the forward pass and warm it up so the first request skips compilation"""
+        import torch
         
-        subject = self.detect_subject(question)
-        prompt = self.create_enhanced_prompt(question, subject)
+        # Compiled graphs rely on the fixed shapes of the static cache
+        if not torch.cuda.is_available() or self.cache_implementation != "static":
+            return
+        
+        # inductor by default; e.g. EDUBOT_COMPILE_BACKEND=aot_ts_nvfuser is faster on some setups
+        backend = os.environ.get("EDUBOT_COMPILE_BACKEND", "inductor")
+        compile_options = {"mode": "reduce-overhead"} if backend == "inductor" else {}
+        eager_forward = self.model.forward
         
         try:
-            # Generate response using pipeline
-            response = self.pipe(
-                prompt,
-                max_new_tokens=400,
-                temperature=0.7,
-                do_sample=True,
-                top_p=0.9,
-                pad_token_id=self.pipe.tokenizer.eos_token_id,
-                repetition_penalty=1.1
+            self.model.forward = torch.compile(
+                eager_forward,
+                backend=backend,
+                fullgraph=True,
+                **compile_options
             )
             
-            # Extract the generated text
-            generated_text = response[0]['generated_text']
-            
-            # Remove the prompt from response
-            answer = generated_text.replace(prompt, "").strip()
-            
-            # Clean up response
-            answer = self.clean_response(answer)
-            
-            # Store conversation
-            self.conversation_history.append({
-                "question": question,
-                "response": answer,
-                "subject": subject
-            })
-            
-            return answer
-            
+            # Runs the request path twice on the persistent cache: the first run compiles,
+            # the second records the CUDA graphs that later requests replay
+            question = "What is energy?"
+            warmup_options = {**self._greedy_options, "max_new_tokens": 8}
+            for _ in range(2):
+                self.generate_with_prefix_cache(question, self.detect_subject(question), warmup_options)
+            print(f"⚡ Model compiled with {backend} backend")
         except Exception as e:
-            return f"I apologize, but I'm having trouble generating a response right now. Please try again with a different question. Error: {str(e)[:100]}"
+            print(f"Model compilation failed, using eager mode: {e}")
+            self.model.forward = eager_forward
     
-    def clean_response(self, response: str) -> str:
-        """Clean and format the response"""
-        # Remove any incomplete sentences at the end
-        response = re.sub(r'[^.!?]*$', '', response)
+    def prepare_generation(self):
+        """Cache tokenizer ids and the token ids of the static prompt parts"""
+        self.eos_token_id = self.tokenizer.eos_token_id
+        self.stop_token_ids = self.create_stop_token_ids()
+        self.create_fixed_generation_options()
+        self._prefix_kv = {}
+        self._static_caches = {}
         
-        # Ensure proper formatting
-        response = response.strip()
+        # Batched prompts are left-padded so every row ends where generation starts
+        self.tokenizer.padding_side = "left"
+        if self.tokenizer.pad_token is None or self.tokenizer.pad_token_id in self.stop_token_ids:
+            self.tokenizer.pad_token = self.select_pad_token()
         
-        # Add proper punctuation if missing
-        if response and not response[-1] in ['.', '!', '?']:
-            response += '.'
-            
-        return response
-
-# Initialize chatbot instance
-chatbot = EducationChatbot()
-
-def gradio_respond(message, history):
-    """Response function for Gradio interface"""
-    if not message.strip():
-        return "Please ask a question about your studies!"
-    
-    # Show typing indicator
-    yield "🔄 Thinking..."
-    
-    response = chatbot.generate_response(message)
-    yield response
-
-def create_gradio_interface():
-    """Create and configure Gradio interface"""
-    
-    # Modern, user-friendly CSS with Color Hunt palette
-    custom_css = """
-    /* Global Reset & Base Styles */
-    * {
-        box-sizing: border-box;
-    }
-    
-    /* Main container with beautiful gradient background */
-    .gradio-container {
-        font-family: 'Inter', 'Segoe UI', 'Roboto', -apple-system, BlinkMacSystemFont, sans-serif;
-        background: linear-gradient(135deg, #fdebd0 0%, #f7cac9 50%, #fdebd0 100%);
-        background-attachment: fixed;
-        min-height: 100vh;
-        padding: 20px;
-    }
-    
-    /* Header Section - Modern & Eye-catching */
-    .gradio-container .header-section {
-        background: linear-gradient(135deg, #dc143c 0%, #f75270 100%);
-        padding: 30px;
-        border-radius: 20px;
-        box-shadow: 0 8px 24px rgba(220, 20, 60, 0.25);
-        margin-bottom: 25px;
-        text-align: center;
-    }
-    
-    .gradio-container h1 {
-        color: #ffffff;
-        font-weight: 800;
-        font-size: 2.5em;
-        margin: 0;
-        text-shadow: 2px 2px 8px rgba(0, 0, 0, 0.2);
-        letter-spacing: -0.5px;
-    }
-    
-    .gradio-container h2 {
-        color: #ffffff;
-        font-weight: 500;
-        font-size: 1.2em;
-        margin: 10px 0 0 0;
-        opacity: 0.95;
-    }
-    
-    .gradio-container h3 {
-        color: #dc143c;
-        font-weight: 700;
-        font-size: 1.4em;
-        margin-bottom: 15px;
-        padding-bottom: 10px;
-        border-bottom: 3px solid #f75270;
-    }
-    
-    /* Markdown sections with glassmorphism effect */
-    .gradio-container .markdown {
-        background: rgba(255, 255, 255, 0.95);
-        backdrop-filter: blur(10px);
-        padding: 25px;
-        border-radius: 16px;
-        box-shadow: 0 4px 20px rgba(220, 20, 60, 0.1);
-        margin: 15px 0;
-        border: 1px solid rgba(247, 82, 112, 0.2);
-    }
-    
-    /* Chatbot Interface - Modern Card Design */
-    .chatbot {
-        min-height: 550px;
-        max-height: 600px;
-        background: #ffffff;
-        border-radius: 16px;
-        border: none;
-        box-shadow: 0 8px 32px rgba(220, 20, 60, 0.15);
-        padding: 20px;
-        overflow-y: auto;
-    }
-    
-    /* Chat Message Bubbles */
-    .chatbot .message {
-        padding: 14px 18px;
-        margin: 12px 0;
-        border-radius: 18px;
-        max-width: 85%;
-        word-wrap: break-word;
-        line-height: 1.6;
-        animation: fadeIn 0.3s ease-in;
-    }
-    
-    @keyframes fadeIn {
-        from {
-            opacity: 0;
-            transform: translateY(10px);
+        # Each prefix is tokenized as one string, as the full prompt is, since tokenizers
+        # like Llama's add a leading space token to every separately encoded part
+        self._prefix_ids = {
+            subject: self.tokenize(PROMPT_PREFIX + self.create_curriculum_info(subject), add_special_tokens=True)
+            for subject in [*self.curriculum_context, "general"]
         }
-        to {
-            opacity: 1;
-            transform: translateY(0);
-        }
-    }
     
-    /* User messages - Right aligned with pink gradient */
-    .chatbot .message.user-message,
-    .chatbot .message[data-author="user"] {
-        background: linear-gradient(135deg, #f75270 0%, #dc143c 100%);
-        color: #000000;
-        margin-left: auto;
-        margin-right: 0;
-        border-bottom-right-radius: 4px;
-        box-shadow: 0 4px 12px rgba(220, 20, 60, 0.2);
-    }
+    def select_pad_token(self) -> str:
+        """Padding token for prompts: masked out of attention, but the repetition penalty
+        still sees it, so a stop token like EOS would be penalized on every padded request"""
+        for token in (self.tokenizer.unk_token, self.tokenizer.bos_token):
+            if token is not None and self.tokenizer.convert_tokens_to_ids(token) not in self.stop_token_ids:
+                return token
+        return self.tokenizer.eos_token
     
-    /* Bot messages - Left aligned with cream background */
-    .chatbot .message.bot-message,
-    .chatbot .message[data-author="bot"] {
-        background: linear-gradient(135deg, #fdebd0 0%, #f7cac9 100%);
-        color: #333333;
-        margin-left: 0;
-        margin-right: auto;
-        border-bottom-left-radius: 4px;
-        box-shadow: 0 4px 12px rgba(247, 82, 112, 0.15);
-    }
+    def create_stop_token_ids(self) -> List[int]:
+        """EOS, plus a paragraph break when the tokenizer has a single token for it"""
+        stop_token_ids = [self.eos_token_id]
+        paragraph_ids = self.tokenizer.encode("\n\n", add_special_tokens=False)
+        if len(paragraph_ids) == 1 and paragraph_ids[0] != self.tokenizer.unk_token_id:
+            stop_token_ids.append(paragraph_ids[0])
+        return stop_token_ids
     
-    /* Text Input - Modern & Accessible */
-    .gradio-container textarea,
-    .gradio-container input[type="text"] {
-        background: #ffffff;
-        border: 2px solid #f7cac9;
-        border-radius: 12px;
-        padding: 16px 20px;
-        font-size: 15px;
-        font-family: inherit;
-        transition: all 0.3s cubic-bezier(0.4, 0, 0.2, 1);
-        resize: none;
-        box-shadow: 0 2px 8px rgba(220, 20, 60, 0.08);
-    }
+    def create_fixed_generation_options(self):
+        """Build the request-independent generation options once per loaded model"""
+        fixed_options = {
+            "pad_token_id": self.eos_token_id,
+            "eos_token_id": self.stop_token_ids,
+            "repetition_penalty": 1.1
+        }
+        self._greedy_options = {**fixed_options, "do_sample": False, "num_beams": 1}
+        self._sampled_options = {**fixed_options, "do_sample": True, "temperature": 0.7, "top_p": 0.9}
     
-    .gradio-container textarea:focus,
-    .gradio-container input[type="text"]:focus {
-        border-color: #f75270;
-        outline: none;
-        box-shadow: 0 0 0 4px rgba(247, 82, 112, 0.15), 0 4px 16px rgba(220, 20, 60, 0.2);
-        transform: translateY(-2px);
-    }
+    def create_cache(self, batch_size: int = 1):
+        """Return an empty KV cache matching the configured cache implementation
+        
+        Static caches are kept per batch size and reset in place: the compiled forward
+        guards on the addresses of their tensors, so a new cache would force a recompile.
+        """
+        if self.cache_implementation == "static":
+            from transformers import StaticCache
+            
+            cache = self._static_caches.get(batch_size)
+            if cache is None:
+                cache = StaticCache(
+                    config=self.model.config,
+                    max_batch_size=batch_size,
+                    max_cache_len=self.max_cache_length,
+                    device=self.model.device,
+                    dtype=self.model.dtype
+                )
+                self._static_caches[batch_size] = cache
+            else:
+                cache.reset()
+            return cache
+        
+        if self.cache_implementation == "quantized":
+            from transformers import HQQQuantizedCache, QuantizedCacheConfig
+            
+            # Keys are quantized per channel and values per token
+            return HQQQuantizedCache(cache_config=QuantizedCacheConfig(
+                backend="HQQ",
+                nbits=self.kv_cache_bits,
+                axis_key=0,
+                axis_value=1,
+                compute_dtype=self.model.dtype,
+                device=self.model.device
+            ))
+        
+        from transformers import DynamicCache
+        
+        return DynamicCache()
     
-    .gradio-container textarea::placeholder,
-    .gradio-container input[type="text"]::placeholder {
-        color: #999;
-        opacity: 0.7;
-    }
+    def get_prefix_cache(self, subject: str):
+        """KV cache holding a subject's prompt prefix, prefilled on first use"""
+        import torch
+        
+        if self.cache_implementation != "static":
+            if subject not in self._prefix_kv:
+                cache = self.create_cache()
+                with torch.inference_mode():
+                    self.model(input_ids=self._prefix_ids[subject], past_key_values=cache, use_cache=True)
+                self._prefix_kv[subject] = cache
+            
+            # Each request extends its own copy so the shared prefix stays intact
+            return copy.deepcopy(self._prefix_kv[subject])
+        
+        # The static cache is reused across requests, so the prefix K/V are kept
+        # aside and copied into its start in place
+        cache = self.create_cache()
+        prefix_length = self._prefix_ids[subject].shape[-1]
+        with torch.inference_mode():
+            if subject not in self._prefix_kv:
+                self.model(input_ids=self._prefix_ids[subject], past_key_values=cache, use_cache=True)
+                self._prefix_kv[subject] = [
+                    (keys[:, :, :prefix_length].clone(), values[:, :, :prefix_length].clone())
+                    for keys, values in self.cache_tensors(cache)
+                ]
+            else:
+                for (keys, values), (prefix_keys, prefix_values) in zip(self.cache_tensors(cache), self._prefix_kv[subject]):
+                    keys[:, :, :prefix_length].copy_(prefix_keys)
+                    values[:, :, :prefix_length].copy_(prefix_values)
+        return cache
     
-    /* Primary Button - Send Button */
-    .gradio-container button.primary {
-        background: linear-gradient(135deg, #dc143c 0%, #f75270 100%);
-        color: #ffffff;
-        border: none;
-        border-radius: 12px;
-        padding: 16px 32px;
-        font-weight: 700;
-        font-size: 16px;
-        cursor: pointer;
-        transition: all 0.3s cubic-bezier(0.4, 0, 0.2, 1);
-        box-shadow: 0 4px 16px rgba(220, 20, 60, 0.3);
-        text-transform: uppercase;
-        letter-spacing: 0.5px;
-        position: relative;
-        overflow: hidden;
-    }
+    def cache_tensors(self, cache) -> List:
+        """(keys, values) tensors of every layer of a static cache, across transformers versions"""
+        if hasattr(cache, "layers"):
+            return [(layer.keys, layer.values) for layer in cache.layers]
+        return list(zip(cache.key_cache, cache.value_cache))
     
-    .gradio-container button.primary::before {
-        content: '';
-        position: absolute;
-        top: 50%;
-        left: 50%;
-        width: 0;
-        height: 0;
-        border-radius: 50%;
-        background: rgba(255, 255, 255, 0.3);
-        transform: translate(-50%, -50%);
-        transition: width 0.6s, height 0.6s;
-    }
+    def fit_to_cache(self, prompt_length: int, options: Dict) -> Dict:
+        """Cap max_new_tokens so the prompt and the answer fit in the KV cache"""
+        room = self.max_cache_length - prompt_length
+        if room < _MIN_NEW_TOKENS:
+            raise ValueError("Your question is too long for me to answer. Please shorten it and try again.")
+        return {**options, "max_new_tokens": min(options["max_new_tokens"], room)}
     
-    .gradio-container button.primary:hover {
-        transform: translateY(-3px);
-        box-shadow: 0 8px 24px rgba(220, 20, 60, 0.4);
-        background: linear-gradient(135deg, #f75270 0%, #dc143c 100%);
-    }
+    def tokenize(self, text: str, add_special_tokens: bool = False) -> "torch.Tensor":
+        """Tokenize a prompt part into input ids on the model device"""
+        input_ids = self.tokenizer(
+            text,
+            return_tensors="pt",
+            add_special_tokens=add_special_tokens
+        ).input_ids
+        return input_ids.to(self.model.device)
     
-    .gradio-container button.primary:hover::before {
-        width: 300px;
-        height: 300px;
-    }
+    def load_curriculum_context(self) -> Dict:
+        """Load Indian curriculum context"""
+        return _CURRICULUM
     
-    .gradio-container button.primary:active {
-        transform: translateY(-1px);
-        box-shadow: 0 4px 12px rgba(220, 20, 60, 0.3);
-    }
+    def create_curriculum_info_cache(self) -> Dict:
+        """Format each subject's curriculum context block once, instead of on every prompt"""
+        return {
+            subject: f"""
+This is for Indian 11th/12th standard {subject} curriculum.
+Key topics include: {', '.join(topics['11th'][:3])} in 11th and {', '.join(topics['12th'][:3])} in 12th.
+
+"""
+            for subject, topics in self.curriculum_context.items()
+        }
     
-    /* Secondary Button - Clear Button */
-    .gradio-container button:not(.primary) {
-        background: #ffffff;
-        color: #dc143c;
-        border: 2px solid #f75270;
-        border-radius: 12px;
-        padding: 16px 32px;
-        font-weight: 600;
-        font-size: 16px;
-        cursor: pointer;
-        transition: all 0.3s cubic-bezier(0.4, 0, 0.2, 1);
-        box-shadow: 0 2px 8px rgba(247, 82, 112, 0.15);
-    }
+    def detect_subject(self, question: str) -> str:
+        """Detect the subject from the question"""
+        words = set(_WORD.findall(question.lower()))
+        # Plurals match their singular keyword
+        words.update([word[:-1] for word in words if word.endswith("s")])
+        
+        for subject, keywords in _SUBJECT_WORD_SETS:
+            if not keywords.isdisjoint(words):
+                return subject
+        
+        return "general"
     
-    .gradio-container button:not(.primary):hover {
-        background: #f7cac9;
-        border-color: #dc143c;
-        color: #dc143c;
-        transform: translateY(-3px);
-        box-shadow: 0 4px 16px rgba(247, 82, 112, 0.25);
-    }
+    def create_curriculum_info(self, subject: str) -> str:
+        """Create the curriculum context block for a subject"""
+        return self._curriculum_info.get(subject, "")
     
-    .gradio-container button:not(.primary):active {
-        transform: translateY(-1px);
-    }
+    def create_enhanced_prompt(self, question: str, subject: str) -> str:
+        """Create enhanced prompt with curriculum context"""
+        return PROMPT_TEMPLATE.format(curriculum_info=self.create_curriculum_info(subject), question=question)
     
-    /* Examples Section - Interactive Cards */
-    .gradio-container .examples {
-        background: rgba(255, 255, 255, 0.95);
-        backdrop-filter: blur(10px);
-        border-radius: 16px;
-        padding: 20px;
-        border: 1px solid rgba(247, 82, 112, 0.2);
-        box-shadow: 0 4px 20px rgba(220, 20, 60, 0.1);
-    }
+    def prompt_length(self, question: str) -> int:
+        """Number of prompt tokens for a question, including the cached prefix"""
+        prompt = self.create_enhanced_prompt(question, self.detect_subject(question))
+        return len(self.tokenizer.encode(prompt))
     
-    .gradio-container .example {
-        background: linear-gradient(135deg, #fdebd0 0%, #f7cac9 100%);
-        border: 2px solid transparent;
-        border-radius: 12px;
-        padding: 14px 18px;
-        margin: 8px 0;
-        cursor: pointer;
-        transition: all 0.3s cubic-bezier(0.4, 0, 0.2, 1);
-        font-size: 14px;
-        color: #333;
-        box-shadow: 0 2px 8px rgba(220, 20, 60, 0.1);
-    }
+    def prompt_bucket(self, length: int, buckets: Tuple[int, ...] = _PROMPT_BUCKETS) -> int:
+        """Smallest padded prompt length that fits, or the length itself for very long prompts"""
+        for bucket in buckets:
+            if length <= bucket:
+                return bucket
+        return length
     
-    .gradio-container .example:hover {
-        background: linear-gradient(135deg, #f75270 0%, #dc143c 100%);
-        color: #ffffff;
-        border-color: #dc143c;
-        transform: translateX(8px) translateY(-2px);
-        box-shadow: 0 6px 20px rgba(220, 20, 60, 0.3);
-    }
+    def create_generation_options(self, questions: List[str]) -> Dict:
+        """Generation options sized to the questions: a shorter budget, greedy for definitions"""
+        if all(_FACTUAL_QUESTION.match(question) for question in questions):
+            options = self._greedy_options
+        else:
+            options = self._sampled_options
+        
+        return {
+            **options,
+            "max_new_tokens": min(400, max(64 + 4 * len(question.split()) for question in questions))
+        }
     
-    /* Labels - Clear & Prominent */
-    .gradio-container label {
-        color: #dc143c;
-        font-weight: 700;
-        font-size: 16px;
-        margin-bottom: 10px;
-        display: block;
-        text-transform: uppercase;
-        letter-spacing: 0.5px;
-        font-size: 14px;
-    }
+    def generate_with_vllm(self, prompts: List[str], options: Dict) -> List[str]:
+        """Generate completions with vLLM, translating the transformers generation options"""
+        from vllm import SamplingParams
+        
+        sampling_params = SamplingParams(
+            max_tokens=options["max_new_tokens"],
+            temperature=options.get("temperature", 0.0) if options["do_sample"] else 0.0,
+            top_p=options.get("top_p", 1.0),
+            repetition_penalty=options["repetition_penalty"],
+            stop_token_ids=options["eos_token_id"]
+        )
+        outputs = self.llm.generate(prompts, sampling_params, use_tqdm=False)
+        return [output.outputs[0].text for output in outputs]
     
-    /* Info Cards */
-    .info-card {
-        background: rgba(255, 255, 255, 0.95);
-        backdrop-filter: blur(10px);
-        border-radius: 16px;
-        padding: 20px;
-        margin: 15px 0;
-        border-left: 4px solid #f75270;
-        box-shadow: 0 4px 20px rgba(220, 20, 60, 0.1);
-    }
+    def generate_response(self, question: str, streamer=None) -> str:
+        """Generate enhanced response with curriculum context, optionally streaming tokens"""
+        if self.model is None and self.llm is None:
+            return "I'm still getting ready to help you. Please wait a moment and try again."
+        
+        subject = self.detect_subject(question)
+        
+        # Repeated questions, like the UI examples, skip generation entirely
+        cached = self.response_cache.get(subject, question)
+        if cached is not None:
+            self.record_conversation(question, cached, subject)
+            return cached
+        
+        try:
+            generation_options = self.create_generation_options([question])
+            
+            if self.llm is not None:
+                prompt = self.create_enhanced_prompt(question, subject)
+                answer = self.generate_with_vllm([prompt], generation_options)[0]
+            else:
+                answer = self.generate_with_prefix_cache(question, subject, generation_options, streamer)
+            
+            # Clean up response
+            answer = self.clean_response(answer.strip())
+            
+            self.record_conversation(question, answer, subject)
+            # An empty answer would be served to every repeat of the question
+            if answer:
+                self.response_cache.put(subject, question, answer, sampled=generation_options["do_sample"])
+            
+            return answer
+            
+        except Exception as e:
+            return f"I apologize, but I'm having trouble generating a response right now. Please try again with a different question. Error: {str(e)[:100]}"
     
-    .info-card ul {
-        list-style: none;
-        padding: 0;
-    }
+    def generate_with_prefix_cache(self, question: str, subject: str, options: Dict, streamer=None) -> str:
+        """Generate one answer with transformers, reusing the subject's prefilled prompt prefix"""
+        import torch
+        
+        # The full prompt is tokenized, so the model sees the same ids as in a batch
+        input_ids = self.tokenize(self.create_enhanced_prompt(question, subject), add_special_tokens=True)
+        prefix_ids = self._prefix_ids[subject]
+        prefix_length = prefix_ids.shape[-1]
+        
+        # The prefilled prefix only applies when the prompt starts with exactly its ids
+        reuse_prefix = (
+            input_ids.shape[-1] > prefix_length
+            and torch.equal(input_ids[0, :prefix_length], prefix_ids[0])
+        )
+        attention_mask = torch.ones_like(input_ids)
+        
+        # Pad the tokens that go through prefill to a bucket length, so compiled graphs
+        # repeat across questions; the masked padding sits right after the cached prefix
+        if self.cache_implementation == "static":
+            start = prefix_length if reuse_prefix else 0
+            length = input_ids.shape[-1] - start
+            padding = self.prompt_bucket(length, _QUESTION_BUCKETS) - length
+            pad_ids = input_ids.new_full((1, padding), self.tokenizer.pad_token_id)
+            input_ids = torch.cat([input_ids[:, :start], pad_ids, input_ids[:, start:]], dim=1)
+            attention_mask = torch.cat([attention_mask[:, :start], torch.zeros_like(pad_ids), attention_mask[:, start:]], dim=1)
+        
+        options = self.fit_to_cache(input_ids.shape[-1], options)
+        
+        # Cache copies and generation both stay in inference mode, so the
+        # cache tensors can be updated in place without autograd tracking
+        with torch.inference_mode():
+            # Reuse the prefilled prefix so only the question tokens go through prefill
+            cache_kwargs = {}
+            if self.cache_implementation is not None:
+                cache_kwargs["past_key_values"] = self.get_prefix_cache(subject) if reuse_prefix else self.create_cache()
+            
+            output_ids = self.model.generate(
+                input_ids=input_ids,
+                attention_mask=attention_mask,
+                **cache_kwargs,
+                streamer=streamer,
+                **options
+            )
+        
+        # Decode only the newly generated tokens
+        return self.tokenizer.decode(
+            output_ids[0, input_ids.shape[-1]:],
+            skip_special_tokens=True
+        )
     
-    .info-card li {
-        padding: 8px 0;
-        padding-left: 25px;
-        position: relative;
-        color: #333;
-    }
+    def generate_padded_batch(self, prompts: List[str], options: Dict) -> List[str]:
+        """Generate answers for several prompts with transformers in one left-padded batch"""
+        import torch
+        
+        encoded = self.tokenizer(prompts)
+        longest = max(len(input_ids) for input_ids in encoded.input_ids)
+        batch = self.tokenizer.pad(
+            encoded,
+            padding="max_length",
+            max_length=self.prompt_bucket(longest),
+            return_tensors="pt"
+        ).to(self.model.device)
+        options = self.fit_to_cache(batch.input_ids.shape[-1], options)
+        
+        with torch.inference_mode():
+            cache_kwargs = {}
+            if self.cache_implementation is not None:
+                cache_kwargs["past_key_values"] = self.create_cache(batch_size=len(prompts))
+            
+            output_ids = self.model.generate(
+                **batch,
+                **cache_kwargs,
+                **options
+            )
+        
+        return self.tokenizer.batch_decode(
+            output_ids[:, batch.input_ids.shape[-1]:],
+            skip_special_tokens=True
+        )
     
-    .info-card li::before {
-        content: '✓';
-        position: absolute;
-        left: 0;
-        color: #dc143c;
-        font-weight: bold;
-        font-size: 18px;
-    }
+    def generate_batch(self, questions: List[str]) -> List[str]:
+        """Generate responses for several questions in one batch"""
+        if self.model is None and self.llm is None:
+            return ["I'm still getting ready to help you. Please wait a moment and try again."] * len(questions)
+        
+        subjects = [self.detect_subject(question) for question in questions]
+        responses = [
+            self.response_cache.get(subject, question)
+            for question, subject in zip(questions, subjects)
+        ]
+        
+        # Only questions without a cached answer go into the batch
+        pending = []
+        for index, response in enumerate(responses):
+            if response is None:
+                pending.append(index)
+            else:
+                self.record_conversation(questions[index], response, subjects[index])
+        
+        if not pending:
+            return responses
+        
+        prompts = [self.create_enhanced_prompt(questions[index], subjects[index]) for index in pending]
+        generation_options = self.create_generation_options([questions[index] for index in pending])
+        
+        try:
+            if self.llm is not None:
+                answers = self.generate_with_vllm(prompts, generation_options)
+            else:
+                answers = self.generate_padded_batch(prompts, generation_options)
+        except Exception as e:
+            error = f"I apologize, but I'm having trouble generating a response right now. Please try again with a different question. Error: {str(e)[:100]}"
+            return [error if response is None else response for response in responses]
+        
+        for index, answer in zip(pending, answers):
+            question, subject = questions[index], subjects[index]
+            answer = self.clean_response(answer.strip())
+            self.record_conversation(question, answer, subject)
+            # An empty answer would be served to every repeat of the question
+            if answer:
+                self.response_cache.put(subject, question, answer, sampled=generation_options["do_sample"])
+            responses[index] = answer
+        
+        return responses
     
-    /* Scrollbar - Custom Styled */
-    .gradio-container ::-webkit-scrollbar {
-        width: 12px;
-    }
+    def record_conversation(self, question: str, answer: str, subject: str):
+        """Store a question and its answer in the conversation history"""
+        self.conversation_history.append(ConversationTurn(question, answer, subject))
     
-    .gradio-container ::-webkit-scrollbar-track {
-        background: #f7cac9;
-        border-radius: 10px;
-    }
+    def clean_response(self, response: str) -> str:
+        """Clean and format the response"""
+        # Remove any incomplete sentence at the end
+        end = max(response.rfind('.'), response.rfind('!'), response.rfind('?'))
+        response = response[:end + 1].strip() if end >= 0 else response.strip()
+        
+        # Add proper punctuation if missing
+        if response and response[-1] not in '.!?':
+            response += '.'
+            
+        return response
+
+class RequestBatcher:
+    """Collect questions arriving close together and answer them in batched generate calls"""
     
-    .gradio-container ::-webkit-scrollbar-thumb {
-        background: linear-gradient(135deg, #f75270 0%, #dc143c 100%);
-        border-radius: 10px;
-        border: 2px solid #f7cac9;
-    }
+    def __init__(self, chatbot: EducationChatbot, max_batch_size: int = 8, batch_window: float = 0.025):
+        self.chatbot = chatbot
+        self.max_batch_size = max_batch_size
+        self.batch_window = batch_window
+        self.queue = None
+        self.worker = None
     
-    .gradio-container ::-webkit-scrollbar-thumb:hover {
-        background: linear-gradient(135deg, #dc143c 0%, #f75270 100%);
-    }
+    async def submit(self, question: str):
+        """Queue a question and yield its answer as it is generated"""
+        # The queue and worker must live on the event loop Gradio is running
+        if self.queue is None:
+            self.queue = asyncio.Queue()
+            self.worker = asyncio.create_task(self.run())
+        
+        # Partial answers arrive on the channel, followed by None once finished
+        channel = asyncio.Queue()
+        await self.queue.put((question, channel))
+        while (text := await channel.get()) is not None:
+            yield text
     
-    /* Row and Column Spacing */
-    .gradio-container .row {
-        gap: 20px;
-        margin: 20px 0;
-    }
+    async def run(self):
+        """Worker loop: drain the queue for one batch window, then generate per length bucket"""
+        loop = asyncio.get_running_loop()
+        while True:
+            pending = [await self.queue.get()]
+            deadline = loop.time() + self.batch_window
+            while len(pending) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    pending.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            
+            # A failing batch must not stop the worker, or every later request would hang
+            try:
+                buckets = self.group_by_length(pending)
+            except Exception as e:
+                print(f"Error grouping requests: {e}")
+                buckets = [[request] for request in pending]
+            
+            for bucket in buckets:
+                try:
+                    await self.process(bucket)
+                except Exception as e:
+                    print(f"Error processing batch: {e}")
+                    for _, channel in bucket:
+                        channel.put_nowait("I apologize, but I'm having trouble generating a response right now. Please try again.")
+                        channel.put_nowait(None)
     
-    .gradio-container .column {
-        gap: 20px;
-    }
+    def group_by_length(self, pending: List) -> List[List]:
+        """Group requests by padded prompt bucket so each batch reuses one compiled shape"""
+        if self.chatbot.model is None:
+            return [pending]
+        
+        buckets = {}
+        for question, channel in pending:
+            bucket = self.chatbot.prompt_bucket(self.chatbot.prompt_length(question))
+            # Prompts past the largest bucket run alone, so one that does not fit
+            # in the KV cache only fails its own request
+            if bucket > _PROMPT_BUCKETS[-1]:
+                bucket = (bucket, id(channel))
+            buckets.setdefault(bucket, []).append((question, channel))
+        return list(buckets.values())
     
-    /* Focus States for Accessibility */
-    .gradio-container *:focus-visible {
-        outline: 3px solid #f75270;
-        outline-offset: 3px;
-        border-radius: 4px;
-    }
+    async def process(self, bucket: List):
+        """Run generation off the event loop and send each answer to its channel"""
+        if len(bucket) == 1:
+            # A single request keeps the prefix KV cache path and streams its tokens
+            await self.stream(*bucket[0])
+            return
+        
+        questions = [question for question, _ in bucket]
+        responses = await asyncio.to_thread(self.chatbot.generate_batch, questions)
+        for (_, channel), response in zip(bucket, responses):
+            channel.put_nowait(response)
+            channel.put_nowait(None)
     
-    /* Responsive Design */
-    @media (max-width: 768px) {
-        .gradio-container {
-            padding: 10px;
-        }
+    async def stream(self, question: str, channel: asyncio.Queue):
+        """Generate one answer, forwarding the text to the channel as tokens arrive"""
+        from transformers import TextIteratorStreamer
         
-        .gradio-container h1 {
-            font-size: 1.8em;
-        }
+        loop = asyncio.get_running_loop()
+        streamer = TextIteratorStreamer(self.chatbot.tokenizer, skip_prompt=True, skip_special_tokens=True)
         
-        .chatbot {
-            min-height: 400px;
-            max-height: 450px;
-        }
-    }
+        def forward_text():
+            partial = ""
+            for text in streamer:
+                partial += text
+                loop.call_soon_threadsafe(channel.put_nowait, partial)
+        
+        forwarding = asyncio.create_task(asyncio.to_thread(forward_text))
+        try:
+            response = await asyncio.to_thread(self.chatbot.generate_response, question, streamer)
+        finally:
+            # Unblocks the forwarder when generation returned before streaming anything
+            streamer.end()
+        await forwarding
+        
+        # The cleaned full answer replaces the raw streamed text
+        channel.put_nowait(response)
+        channel.put_nowait(None)
+
+# Chatbot instance, created in main() so importing this module does not load the model
+chatbot = None
+batcher = None
+
+async def gradio_respond(message, history):
+    """Response function for Gradio interface"""
+    if not message.strip():
+        yield "Please ask a question about your studies!"
+        return
     
-    /* Loading Animation */
-    @keyframes pulse {
-        0%, 100% {
-            opacity: 1;
-        }
-        50% {
-            opacity: 0.5;
-        }
-    }
+    # Show typing indicator until the first tokens arrive
+    yield "🔄 Thinking..."
     
-    .gradio-container .loading {
-        animation: pulse 1.5s ease-in-out infinite;
-    }
-    """
+    async for response in batcher.submit(message):
+        yield response
+
+@lru_cache(maxsize=None)
+def load_custom_css() -> str:
+    """Read the Gradio stylesheet from static/app.css once"""
+    return (Path(__file__).parent / "static" / "app.css").read_text(encoding="utf-8")
+
+def create_gradio_interface():
+    """Create and configure Gradio interface"""
+    import gradio as gr
     
-    with gr.Blocks(css=custom_css, title="EduBot - Study Assistant", theme=gr.themes.Soft()) as demo:
+    with gr.Blocks(css=load_custom_css(), title="EduBot - Study Assistant", theme=gr.themes.Soft()) as demo:
         # Header Section
         with gr.Row():
             gr.Markdown(
@@ -685,13 +994,14 @@ def create_gradio_interface():
                     clear_btn = gr.Button("Clear Chat 🗑️", scale=1)
         
         # Handle interactions
-        def respond_message(message, chat_history):
+        async def respond_message(message, chat_history):
             if not message.strip():
-                return chat_history, ""
+                yield chat_history, ""
+                return
             
             chat_history.append([message, ""])
             
-            for response in gradio_respond(message, chat_history):
+            async for response in gradio_respond(message, chat_history):
                 chat_history[-1][1] = response
                 yield chat_history, ""
         
@@ -719,14 +1029,28 @@ def create_gradio_interface():
     
     return demo
 
+def configure_torch():
+    """Process-wide torch settings, applied once at startup before the model loads"""
+    import torch
+    
+    # Room for one compiled graph per prompt bucket, subject prefix and batch size
+    torch._dynamo.config.cache_size_limit = 64
+
 def main():
     """Main function to run the application"""
+    global chatbot, batcher
+    
     print("🚀 Starting EduBot Web Interface...")
     print("📚 AI Tutor for 11th/12th Grade Indian Students")
     print("🌐 Server will start at: http://localhost:7860")
     
     try:
+        configure_torch()
+        chatbot = EducationChatbot()
+        batcher = RequestBatcher(chatbot)
         demo = create_gradio_interface()
+        # Let several sessions stream at once; the batcher merges their generate calls
+        demo.queue(default_concurrency_limit=4, max_size=32)
         demo.launch(
             server_name="0.0.0.0",
             server_port=7860,